@@ -0,0 +1,229 @@
+# Run from the repository root: python -m benchmarks.bench [--output results.json] [--baseline results.json]
+
+# =-- Dependencies --= #
+import tempfile
+import os
+
+# Point the database at a throwaway file before db.db connects on import
+BENCH_DIRECTORY = tempfile.mkdtemp(prefix="morsecryption-bench-")
+os.environ["MORSECRYPTION_DB_URL"] = f"sqlite:///{os.path.join(BENCH_DIRECTORY, 'bench.db')}"
+
+from db.db import Message, session, create_or_get_client, create_message, get_client_by_name, list_all_messages
+from util.crypto_utils import encrypt, decrypt, hash_sha512
+from util.morse_utils import MorseCodeTree, MorseCodeDict
+from sqlalchemy import insert
+import client as client_module
+import statistics
+import argparse
+import platform
+import datetime
+import random
+import shutil
+import json
+import time
+import sys
+
+# =-- Constant Settings --= #
+SEED = 1337
+MESSAGE_SIZES = [10, 100, 1000] # Characters per message
+SEED_ROWS = [100, 1000, 10000] # Messages in the seeded database
+
+# =-- Hardware Stubs --= #
+class NullLED:
+    def __init__(self):
+        self.toggles = 0
+
+    def on(self):
+        self.toggles += 1
+
+    def off(self):
+        self.toggles += 1
+
+def confirm_sequence_stub(code, led):
+    # Same signal walk as util.morse_utils.confirm_sequence, without the sleeps
+    for word in code.split("/"):
+        for signal in word:
+            if signal in ".-":
+                led.on()
+                led.off()
+
+# =-- Fixtures --= #
+def random_morse(rng, characters):
+    """
+    Builds a morse code message of the given number of characters, in five-character words.
+    :param rng: The seeded random generator.
+    :param characters: The number of characters.
+    :return: The morse code string.
+    """
+    codes = [rng.choice(list(MorseCodeDict.values())) for _ in range(characters)]
+    return "/".join(" ".join(codes[i:i + 5]) for i in range(0, characters, 5))
+
+def seed_messages(rows, sender_id, receiver_id, auth_key, ciphertext, iv, chunk_size=1000):
+    """
+    Bulk inserts the given number of messages between two clients.
+    :return: None
+    """
+    for start in range(0, rows, chunk_size):
+        values = [{
+            "content": ciphertext, "direction": "sent", "sender_id": sender_id,
+            "receiver_id": receiver_id, "auth_key": auth_key, "iv": iv
+        } for _ in range(min(chunk_size, rows - start))]
+        session.execute(insert(Message.__table__), values)
+    session.commit()
+
+# =-- Measurement --= #
+def measure(function, repeat, number):
+    """
+    Times function in repeat rounds of number calls each.
+    :param function: A callable taking no arguments.
+    :param repeat: The number of rounds.
+    :param number: The number of calls per round.
+    :return: Per-call seconds (min, median, mean, stdev) and the call counts.
+    """
+    function() # Warm up caches and lazy imports
+
+    timings = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        for _ in range(number):
+            function()
+        timings.append((time.perf_counter() - start_time) / number)
+
+    return {
+        "min": min(timings),
+        "median": statistics.median(timings),
+        "mean": statistics.fmean(timings),
+        "stdev": statistics.stdev(timings) if len(timings) > 1 else 0.0,
+        "repeat": repeat,
+        "number": number
+    }
+
+def run_benchmarks(repeat, number, log=sys.stderr):
+    """
+    Runs every benchmark against fresh fixtures.
+    :param repeat: The number of timing rounds per benchmark.
+    :param number: The number of calls per round.
+    :param log: Where progress lines are written.
+    :return: A dict of benchmark name to timings.
+    """
+    rng = random.Random(SEED)
+    results = {}
+
+    def bench(name, function, calls=number):
+        results[name] = measure(function, repeat, calls)
+        log.write(f"{name:<40} {results[name]['median'] * 1e6:>12.2f} us\n")
+
+    # Codec
+    def populate():
+        MorseCodeTree().populate_tree()
+    bench("morse.populate_tree", populate)
+
+    tree = MorseCodeTree()
+    tree.populate_tree()
+    messages = {size: random_morse(rng, size) for size in MESSAGE_SIZES}
+    for size, message in messages.items():
+        bench(f"morse.decode[{size}]", lambda: tree.decode(message))
+
+    # Crypto
+    k_enc, k_auth = hash_sha512("benchmark password")
+    bench("crypto.hash_sha512", lambda: hash_sha512("benchmark password"))
+    for size, message in messages.items():
+        iv, ciphertext = encrypt(message, k_enc)
+        bench(f"crypto.encrypt[{size}]", lambda: encrypt(message, k_enc))
+        bench(f"crypto.decrypt[{size}]", lambda: decrypt(ciphertext, iv, k_enc))
+
+    # Storage
+    sender = create_or_get_client("bench-sender", k_auth)
+    receiver = create_or_get_client("bench-receiver", k_auth)
+    iv, ciphertext = encrypt(messages[MESSAGE_SIZES[0]], k_enc)
+
+    seeded = 0
+    for rows in SEED_ROWS:
+        seed_messages(rows - seeded, sender.id, receiver.id, k_auth, ciphertext, iv)
+        seeded = rows
+        bench(f"db.list_all_messages[{rows}]", list_all_messages, calls=max(1, number // 10))
+
+    bench("db.get_client_by_name", lambda: get_client_by_name("bench-sender"))
+    bench("db.create_message", lambda: create_message(ciphertext, "sent", sender.id, receiver.id, k_auth, iv))
+
+    # Full send -> receive -> process_inbox path with the LED stubbed
+    client_module.confirm_sequence = confirm_sequence_stub
+    alice = client_module.Client("bench-alice", *hash_sha512("alice"))
+    bob = client_module.Client("bench-bob", *hash_sha512("bob"))
+    led = NullLED()
+    for size, message in messages.items():
+        bench(f"pipeline.send[{size}]", lambda: alice.send(bob, message, led))
+
+    return results
+
+# =-- Baseline Comparison --= #
+def compare(results, baseline, threshold):
+    """
+    Compares median timings against a stored baseline.
+    :param results: The current benchmark results.
+    :param baseline: A results document previously written by this script.
+    :param threshold: The allowed slowdown as a fraction (0.2 = 20%).
+    :return: A list of (name, baseline median, current median, ratio) for each regression.
+    """
+    regressions = []
+    for name, timings in results.items():
+        previous = baseline["results"].get(name)
+        if previous is None:
+            continue
+
+        ratio = timings["median"] / previous["median"]
+        if ratio > 1 + threshold:
+            regressions.append((name, previous["median"], timings["median"], ratio))
+
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the codec, crypto and storage layers without hardware.")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing rounds per benchmark.")
+    parser.add_argument("--number", type=int, default=100, help="Calls per timing round.")
+    parser.add_argument("--output", help="Write the JSON results here instead of stdout.")
+    parser.add_argument("--baseline", help="A previous JSON result to compare against.")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="Allowed slowdown against the baseline before failing (0.2 = 20%%).")
+    args = parser.parse_args(argv)
+
+    # Read the baseline up front: --output may point at the same file to refresh it in place
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+
+    try:
+        results = run_benchmarks(args.repeat, args.number)
+    finally:
+        session.close()
+        shutil.rmtree(BENCH_DIRECTORY, ignore_errors=True)
+
+    document = {
+        "created": datetime.datetime.now(datetime.UTC).isoformat(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "seed": SEED,
+        "results": results
+    }
+
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(document, output, indent=2)
+    else:
+        json.dump(document, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.threshold)
+
+        for name, before, after, ratio in regressions:
+            sys.stderr.write(f"REGRESSION {name}: {before * 1e6:.2f} us -> {after * 1e6:.2f} us ({ratio:.2f}x)\n")
+
+        if regressions:
+            sys.exit(1)
+
+        sys.stderr.write("No regressions against the baseline.\n")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+# =-- Dependencies --= #
+from db.db import (iter_messages, iter_clients, verify_client_by_id, get_client_by_name, get_client_by_id,
+    get_message_by_id)
+from db.archive import export_archive, import_archive
+from db.retention import RetentionPolicy, apply_retention, enable_incremental_vacuum
+from util.crypto_utils import hash_sha512, decrypt
+from util.morse_utils import MorseCodeTree
+import argparse
+import datetime
+import json
+import csv
+import sys
+import os
+
+# =-- Constant Settings --= #
+PASSWORD_ENV_VAR = "MORSECRYPTION_PASSWORD"
+MESSAGE_FIELDS = ["id", "seq", "direction", "sender_id", "receiver_id", "timestamp"]
+CLIENT_FIELDS = ["id", "name"]
+
+# =-- Output --= #
+class RecordWriter:
+    def __init__(self, output_format, fields, stream=sys.stdout):
+        self.output_format = output_format
+        self.fields = fields
+        self.stream = stream
+        self.csv_writer = None
+
+        if output_format == "csv":
+            self.csv_writer = csv.DictWriter(stream, fieldnames=fields)
+            self.csv_writer.writeheader()
+
+    def write(self, record):
+        """
+        Writes a single record to the stream as soon as it is available.
+        :param record: A dict keyed by the writer's fields.
+        :return: None
+        """
+        match self.output_format:
+            case "json":
+                # One JSON object per line so consumers can stream the output
+                self.stream.write(json.dumps(record, default=str) + "\n")
+            case "csv":
+                self.csv_writer.writerow(record)
+            case _:
+                self.stream.write(" | ".join(f"{field}: {record[field]}" for field in self.fields) + "\n")
+
+def message_record(message):
+    """
+    Converts a message object into an output record.
+    :param message: The message object.
+    :return: A dict of the message's public fields.
+    """
+    return {
+        "id": message.id,
+        "seq": message.seq,
+        "direction": message.direction,
+        "sender_id": message.sender_id,
+        "receiver_id": message.receiver_id,
+        "timestamp": message.timestamp.isoformat() if message.timestamp else None
+    }
+
+def client_record(client):
+    """
+    Converts a client object into an output record.
+    :param client: The client object.
+    :return: A dict of the client's public fields.
+    """
+    return {"id": client.id, "name": client.name}
+
+def read_password(args):
+    """
+    Reads the master password from stdin or the environment, never from a prompt.
+    :param args: The parsed command line arguments.
+    :return: The master password.
+    """
+    if args.password_stdin:
+        return sys.stdin.readline().rstrip("\r\n")
+
+    password = os.environ.get(PASSWORD_ENV_VAR)
+    if password is None:
+        raise SystemExit(f"No password given; use --password-stdin or set {PASSWORD_ENV_VAR}.")
+
+    return password
+
+# =-- Commands --= #
+def list_messages_command(args):
+    client = None
+    if args.client is not None:
+        client = get_client_by_name(args.client)
+
+        if client is None:
+            raise SystemExit("Client not found.")
+
+    writer = RecordWriter(args.format, MESSAGE_FIELDS)
+    for message in iter_messages(client, args.chunk_size, args.since, args.until):
+        writer.write(message_record(message))
+
+def list_clients_command(args):
+    writer = RecordWriter(args.format, CLIENT_FIELDS)
+    for client in iter_clients(args.chunk_size):
+        writer.write(client_record(client))
+
+def get_client_command(args):
+    if args.id is not None:
+        client = get_client_by_id(args.id)
+    else:
+        client = get_client_by_name(args.name)
+
+    if client is None:
+        raise SystemExit("Client not found.")
+
+    RecordWriter(args.format, CLIENT_FIELDS).write(client_record(client))
+
+def decrypt_command(args):
+    message = get_message_by_id(args.message_id)
+
+    if message is None:
+        raise SystemExit("Message not found.")
+
+    k_enc, k_auth = hash_sha512(read_password(args))
+
+    # Deleting a client nulls the receiver of its messages
+    if message.receiver_id is None:
+        raise SystemExit(f"Recipient of message {message.id}: Client not found.")
+
+    try:
+        verified = verify_client_by_id(message.receiver_id, k_auth)
+    except Exception as e: # db.db raises a bare Exception for missing clients
+        raise SystemExit(f"Recipient of message {message.id}: {e}.")
+
+    if not verified:
+        raise SystemExit("Verification failed.")
+
+    morse_tree = MorseCodeTree()
+    morse_tree.populate_tree()
+
+    try:
+        decrypted_message = decrypt(message.content, message.iv, k_enc)
+    except ValueError as e:
+        raise SystemExit(f"Unable to decrypt message {message.id}: {e}")
+
+    try:
+        decoded_message = morse_tree.decode(decrypted_message)
+    except (ValueError, TypeError) as e: # TypeError: signal group ends on an unassigned tree node
+        raise SystemExit(f"Unable to decode message {message.id}: {e}")
+
+    record = message_record(message)
+    record["decrypted"] = decrypted_message
+    record["decoded"] = decoded_message
+
+    RecordWriter(args.format, MESSAGE_FIELDS + ["decrypted", "decoded"]).write(record)
+
+def export_command(args):
+    counts = export_archive(args.path, args.compression, args.chunk_size)
+    RecordWriter(args.format, ["client", "messages"]).write(counts)
+
+def import_command(args):
+    try:
+        counts = import_archive(args.path, args.chunk_size)
+    except ValueError as e:
+        raise SystemExit(f"Import failed: {e}")
+
+    RecordWriter(args.format, ["client", "messages", "duplicates"]).write(counts)
+
+def prune_command(args):
+    if args.enable_incremental_vacuum:
+        enable_incremental_vacuum()
+
+    policy = RetentionPolicy(
+        max_age=datetime.timedelta(days=args.max_age_days) if args.max_age_days is not None else None,
+        max_rows_per_client=args.max_rows_per_client,
+        max_db_bytes=int(args.max_db_mb * 1024 * 1024) if args.max_db_mb is not None else None
+    )
+
+    # The process exits after reporting, so a background vacuum is waited for here
+    try:
+        report = apply_retention(policy, args.archive, args.compression, args.chunk_size, args.vacuum).wait()
+    except ValueError as e:
+        raise SystemExit(f"Prune failed: {e}")
+
+    record = report.as_dict()
+    record.update({f"deleted_{rule}": count for rule, count in record.pop("deleted").items()})
+    RecordWriter(args.format, list(record)).write(record)
+
+# =-- Argument Parsing --= #
+def build_parser():
+    parser = argparse.ArgumentParser(description="Non-interactive access to the messaging logging database.")
+    parser.add_argument("--format", choices=["text", "json", "csv"], default="text",
+                        help="Output format; json emits one object per line.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    list_messages_parser = subparsers.add_parser("list-messages", help="List the time log of messages.")
+    list_messages_parser.add_argument("--client", help="Only list messages sent by this client name.")
+    list_messages_parser.add_argument("--since", type=datetime.datetime.fromisoformat,
+                                      help="Only list messages at or after this ISO 8601 UTC time.")
+    list_messages_parser.add_argument("--until", type=datetime.datetime.fromisoformat,
+                                      help="Only list messages before this ISO 8601 UTC time.")
+    list_messages_parser.add_argument("--chunk-size", type=int, default=500, help="Rows fetched per query.")
+    list_messages_parser.set_defaults(func=list_messages_command)
+
+    list_clients_parser = subparsers.add_parser("list-clients", help="List all clients.")
+    list_clients_parser.add_argument("--chunk-size", type=int, default=500, help="Rows fetched per query.")
+    list_clients_parser.set_defaults(func=list_clients_command)
+
+    get_client_parser = subparsers.add_parser("get-client", help="Search a client by name or ID.")
+    get_client_group = get_client_parser.add_mutually_exclusive_group(required=True)
+    get_client_group.add_argument("--name", help="The name of the client.")
+    get_client_group.add_argument("--id", type=int, help="The ID of the client.")
+    get_client_parser.set_defaults(func=get_client_command)
+
+    decrypt_parser = subparsers.add_parser("decrypt", help="Decrypt and decode a message by ID.")
+    decrypt_parser.add_argument("message_id", type=int, help="The ID of the message.")
+    decrypt_parser.add_argument("--password-stdin", action="store_true",
+                                help=f"Read the recipient's master password from stdin instead of {PASSWORD_ENV_VAR}.")
+    decrypt_parser.set_defaults(func=decrypt_command)
+
+    export_parser = subparsers.add_parser("export", help="Stream all clients and messages to an NDJSON archive.")
+    export_parser.add_argument("path", help="The archive file to write.")
+    export_parser.add_argument("--compression", choices=["gzip", "bz2", "xz"], help="Compress the archive.")
+    export_parser.add_argument("--chunk-size", type=int, default=500, help="Rows fetched per query.")
+    export_parser.set_defaults(func=export_command)
+
+    import_parser = subparsers.add_parser("import", help="Import an archive written by export.")
+    import_parser.add_argument("path", help="The archive file to read; compression is detected automatically.")
+    import_parser.add_argument("--chunk-size", type=int, default=500, help="Rows inserted per transaction.")
+    import_parser.set_defaults(func=import_command)
+
+    prune_parser = subparsers.add_parser("prune", help="Delete messages outside the retention policy.")
+    prune_parser.add_argument("--max-age-days", type=float, help="Delete messages older than this many days.")
+    prune_parser.add_argument("--max-rows-per-client", type=int, help="Keep only this many messages per sender.")
+    prune_parser.add_argument("--max-db-mb", type=float, help="Delete the oldest messages until the data fits.")
+    prune_parser.add_argument("--archive", help="Write deleted messages to this archive first; appends if it exists.")
+    prune_parser.add_argument("--compression", choices=["gzip", "bz2", "xz"], help="Compress the archive.")
+    prune_parser.add_argument("--chunk-size", type=int, default=500, help="Rows deleted per transaction.")
+    prune_parser.add_argument("--vacuum", choices=["none", "foreground", "background"], default="foreground",
+                              help="Return freed pages to the file system.")
+    prune_parser.add_argument("--enable-incremental-vacuum", action="store_true",
+                              help="Convert an existing database to incremental auto_vacuum first (one full VACUUM).")
+    prune_parser.set_defaults(func=prune_command)
+
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    try:
+        args.func(args)
+    except BrokenPipeError:
+        # Downstream consumer (e.g. head) closed the pipe early
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
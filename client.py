@@ -2,7 +2,13 @@
 from db.db import create_or_get_client, create_message, get_client_by_name
 from util.morse_utils import confirm_sequence, MorseCodeTree
 from util.crypto_utils import encrypt, decrypt
+from util import metrics
 import gpiozero
+import logging
+
+# =-- Logging --= #
+message_logger = logging.getLogger("handler.message")
+crypto_logger = logging.getLogger("handler.crypto")
 
 # =-- Client Class --= #
 class Client:
@@ -25,9 +31,11 @@ class Client:
         :param led: The LED to verify.
         :return: None
         """
-        print(f"[ENCRYPTION/DECRYPTION HANDLER] Encrypting outgoing message from {self.name} to {recipient.name}")
-        iv, encrypted_message = encrypt(plaintext_message, recipient.key) # Encrypt using recipient's key
-        print(f"[ENCRYPTION/DECRYPTION HANDLER] Encrypted outgoing message from {self.name} to {recipient.name}: {encrypted_message}")
+        crypto_logger.info("Encrypting outgoing message from %s to %s", self.name, recipient.name)
+        with metrics.timer("encrypt"):
+            iv, encrypted_message = encrypt(plaintext_message, recipient.key) # Encrypt using recipient's key
+        crypto_logger.debug("Encrypted outgoing message from %s to %s: %s", self.name, recipient.name, encrypted_message)
+        metrics.count("messages_sent")
         recipient.receive(self, encrypted_message, iv, led)
 
     def receive(self, sender, message, iv, led: gpiozero.LED):
@@ -39,10 +47,13 @@ class Client:
         :param led: The LED to verify.
         :return: None
         """
-        receiver_client = get_client_by_name(self.name)
-        sender_client = get_client_by_name(sender.name)
+        with metrics.timer("db_lookup"):
+            receiver_client = get_client_by_name(self.name)
+            sender_client = get_client_by_name(sender.name)
 
-        create_message(message, "sent", sender_client.id, receiver_client.id, self.auth_key, iv)
+        with metrics.timer("db_insert"):
+            create_message(message, "sent", sender_client.id, receiver_client.id, self.auth_key, iv)
+        metrics.count("messages_received")
 
         self.inbox.append((sender, message, iv, led))
         self.process_inbox()
@@ -50,17 +61,22 @@ class Client:
     def process_inbox(self):
         if self.inbox:  # If there are many messages
             for sender, message, iv, led in self.inbox:  # Log messages
-                print(f"[MESSAGE HANDLER] ({self.name} -> {sender.name}) | {message}")
-                print(f"[ENCRYPTION/DECRYPTION HANDLER] Decrypting incoming message from {sender.name}...")
+                message_logger.info("(%s -> %s) | Message received", self.name, sender.name)
+                message_logger.debug("(%s -> %s) | %s", self.name, sender.name, message)
+                crypto_logger.info("Decrypting incoming message from %s...", sender.name)
                 try:
-                    decrypted_message = decrypt(message, iv, self.key)
-                    print(
-                        f"[ENCRYPTION/DECRYPTION HANDLER] {self.name} decrypted incoming message from {sender.name}: {decrypted_message}")
-                    print("[ENCRYPTION/DECRYPTION HANDLER] Confirming sequence on LED.")
-                    confirm_sequence(decrypted_message, led)
+                    with metrics.timer("decrypt"):
+                        decrypted_message = decrypt(message, iv, self.key)
+                    crypto_logger.debug("%s decrypted incoming message from %s: %s", self.name, sender.name, decrypted_message)
+                    crypto_logger.info("Confirming sequence on LED.")
+                    with metrics.timer("led_confirm"):
+                        confirm_sequence(decrypted_message, led)
 
-                    decoded_message = self.morse_code_tree.decode(decrypted_message)
-                    print(f"[ENCRYPTION/DECRYPTION HANDLER] Decoded message from  {sender.name}: {decoded_message}")
+                    with metrics.timer("decode"):
+                        decoded_message = self.morse_code_tree.decode(decrypted_message)
+                    crypto_logger.debug("Decoded message from %s: %s", sender.name, decoded_message)
+                    metrics.count("messages_processed")
                 except Exception as e:
-                    print("[ENCRYPTION/DECRYPTION HANDLER] Error: ", e)
+                    crypto_logger.exception("Error: %s", e)
+                    metrics.count("message_errors")
             self.inbox.clear()  # Delete the processed messages
\ No newline at end of file
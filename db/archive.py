@@ -0,0 +1,297 @@
+# =-- Dependencies --= #
+from db.db import Client, Message, session, iter_clients, iter_messages
+from sqlalchemy import insert
+import contextlib
+import datetime
+import json
+import io
+import os
+import gzip
+import bz2
+import lzma
+
+# =-- Constant Settings --= #
+ARCHIVE_FORMAT = "morsecryption-archive"
+ARCHIVE_VERSION = 1
+OPENERS = {None: open, "gzip": gzip.open, "bz2": bz2.open, "xz": lzma.open}
+MAGIC_NUMBERS = {b"\x1f\x8b": "gzip", b"BZh": "bz2", b"\xfd7zXZ\x00": "xz"}
+
+# =-- Archive Files --= #
+def detect_compression(path):
+    """
+    Detects the compression of an existing archive from its magic number.
+    :param path: The path of the archive.
+    :return: "gzip", "bz2", "xz", or None for plain NDJSON.
+    """
+    with open(path, "rb") as archive:
+        header = archive.read(6)
+
+    for magic, compression in MAGIC_NUMBERS.items():
+        if header.startswith(magic):
+            return compression
+
+    return None
+
+def open_archive(path, mode, compression=None):
+    """
+    Opens an NDJSON archive as a text stream.
+    :param path: The path of the archive.
+    :param mode: "r" to read or "w" to write.
+    :param compression: One of None, "gzip", "bz2" or "xz". Detected automatically when reading.
+    :return: A text file object.
+    """
+    if mode == "r":
+        compression = detect_compression(path)
+
+    if compression not in OPENERS:
+        raise ValueError(f"Unsupported compression: {compression}")
+
+    return OPENERS[compression](path, mode + "t", encoding="utf-8")
+
+@contextlib.contextmanager
+def archive_member(fileobj, compression=None):
+    """
+    Writes one self-contained (compressed) member to an archive file opened in binary mode.
+    When the block exits the member is complete and synced to disk; the readers of all supported
+    compressions treat concatenated members as one stream.
+    :param fileobj: The binary archive file.
+    :param compression: One of None, "gzip", "bz2" or "xz".
+    :return: A text stream for write_header and write_record.
+    """
+    if compression not in OPENERS:
+        raise ValueError(f"Unsupported compression: {compression}")
+
+    binary = fileobj if compression is None else OPENERS[compression](fileobj, "wb")
+    stream = io.TextIOWrapper(binary, encoding="utf-8")
+
+    try:
+        yield stream
+    finally:
+        stream.flush()
+        stream.detach() # Leave fileobj open for the next member
+
+        # Closing the compressor writes out its buffered data and end-of-stream marker
+        if compression is not None:
+            binary.close()
+
+        fileobj.flush()
+        os.fsync(fileobj.fileno())
+
+def _text(value):
+    # Ciphertexts and IVs are stored as base64 bytes; archives hold them as strings
+    if isinstance(value, bytes):
+        return value.decode()
+
+    return value
+
+def client_row(client: Client):
+    """
+    Converts a client object into an archive row.
+    :param client: The client object.
+    :return: A JSON-serializable dict.
+    """
+    return {"id": client.id, "name": client.name, "auth_key": _text(client.auth_key)}
+
+def message_row(message: Message):
+    """
+    Converts a message object into an archive row.
+    :param message: The message object.
+    :return: A JSON-serializable dict.
+    """
+    return {
+        "id": message.id,
+        "seq": message.seq,
+        "content": _text(message.content),
+        "direction": message.direction,
+        "sender_id": message.sender_id,
+        "receiver_id": message.receiver_id,
+        "auth_key": _text(message.auth_key),
+        "iv": _text(message.iv),
+        "timestamp": message.timestamp.isoformat() if message.timestamp else None
+    }
+
+def write_record(archive, table, row):
+    """
+    Writes a single row to an open archive.
+    :param archive: The text stream returned by open_archive.
+    :param table: The table the row belongs to ("client" or "messages").
+    :param row: The row dict.
+    :return: None
+    """
+    archive.write(json.dumps({"table": table, "row": row}) + "\n")
+
+def write_header(archive, chunk_size: int=500):
+    """
+    Writes the archive header followed by every client, which messages written afterwards refer to.
+    :param archive: The text stream returned by open_archive.
+    :param chunk_size: The number of clients to fetch per query.
+    :return: The number of clients written.
+    """
+    archive.write(json.dumps({"format": ARCHIVE_FORMAT, "version": ARCHIVE_VERSION}) + "\n")
+
+    return write_clients(archive, chunk_size)
+
+def write_clients(archive, chunk_size: int=500):
+    """
+    Writes every client, e.g. when appending to an existing archive whose header lacks newer clients.
+    :param archive: The text stream returned by open_archive.
+    :param chunk_size: The number of clients to fetch per query.
+    :return: The number of clients written.
+    """
+    count = 0
+    for client in iter_clients(chunk_size):
+        write_record(archive, "client", client_row(client))
+        count += 1
+
+    return count
+
+# =-- Export --= #
+def export_archive(path, compression=None, chunk_size: int=500, messages=None):
+    """
+    Streams every client and the given messages into an NDJSON archive.
+    Rows are fetched chunk_size at a time, so memory use does not grow with the table.
+    :param path: The path of the archive to write.
+    :param compression: One of None, "gzip", "bz2" or "xz".
+    :param chunk_size: The number of rows to fetch per query.
+    :param messages: An optional iterable of message objects; defaults to every message.
+    :return: A dict of the number of rows written per table.
+    """
+    if messages is None:
+        messages = iter_messages(chunk_size=chunk_size)
+
+    counts = {"client": 0, "messages": 0}
+
+    with open_archive(path, "w", compression) as archive:
+        # Clients first so that imports can resolve message senders and receivers
+        counts["client"] = write_header(archive, chunk_size)
+
+        for message in messages:
+            write_record(archive, "messages", message_row(message))
+            counts["messages"] += 1
+
+    return counts
+
+# =-- Import --= #
+def _import_clients(rows, client_ids):
+    # Reuse clients that already exist under the same name
+    names = [row["name"] for row in rows]
+    existing = {client.name: client for client in session.query(Client).filter(Client.name.in_(names))}
+
+    resolved = []
+    for row in rows:
+        client = existing.get(row["name"])
+
+        if client is None:
+            client = Client(name=row["name"], auth_key=row["auth_key"])
+            existing[row["name"]] = client
+            session.add(client)
+        elif _text(client.auth_key) != row["auth_key"]:
+            # Messages for this client were encrypted under a different master password
+            raise ValueError(f"Client {row['name']} already exists with a different auth key")
+
+        resolved.append((row, client))
+
+    session.commit()
+
+    # Names are not unique, so a row may match a client created earlier in this chunk; IDs exist only now
+    for row, client in resolved:
+        client_ids[row["id"]] = client.id
+
+def _existing_message_keys(rows):
+    # IVs are random per message, so (iv, content) identifies a message across databases.
+    # Rows written by Client.receive hold bytes and imported rows hold strings, so look up both.
+    ivs = [row["iv"] for row in rows]
+    query = session.query(Message.iv, Message.content).filter(Message.iv.in_(ivs + [iv.encode() for iv in ivs]))
+
+    return {(_text(iv), _text(content)) for iv, content in query}
+
+def _import_messages(rows, client_ids):
+    seen = _existing_message_keys(rows)
+    skipped = 0
+
+    values = []
+    for row in rows:
+        # Messages of deleted clients keep a NULL sender or receiver
+        if any(client_id is not None and client_id not in client_ids for client_id in (row["sender_id"], row["receiver_id"])):
+            raise ValueError(f"Archived message {row['id']} references a client missing from the archive")
+
+        # Skip messages already imported from an overlapping archive
+        key = (row["iv"], row["content"])
+        if key in seen:
+            skipped += 1
+            continue
+        seen.add(key)
+
+        values.append({
+            "content": row["content"],
+            "direction": row["direction"],
+            "sender_id": client_ids.get(row["sender_id"]),
+            "receiver_id": client_ids.get(row["receiver_id"]),
+            "auth_key": row["auth_key"],
+            "iv": row["iv"],
+            "timestamp": datetime.datetime.fromisoformat(row["timestamp"]) if row["timestamp"] else None
+        })
+
+    # A single executemany per chunk instead of one ORM object per message
+    if values:
+        session.execute(insert(Message.__table__), values)
+        session.commit()
+
+    return skipped
+
+def import_archive(path, chunk_size: int=500):
+    """
+    Imports an archive written by export_archive using batched inserts.
+    Clients are matched by name and must have the same auth key; messages get new IDs and are re-linked
+    to the imported clients. Archived timestamps are kept, so imported history lists in time order among local
+    messages; sequence numbers are reassigned in archive order. Messages already in the database (same IV and ciphertext) are skipped.
+    :param path: The path of the archive to read.
+    :param chunk_size: The number of rows to insert per transaction.
+    :return: A dict of the number of rows read per table and of duplicate messages skipped.
+    """
+    counts = {"client": 0, "messages": 0, "duplicates": 0}
+    client_ids = {}  # Archived client ID -> client ID in this database
+    client_rows = []
+    message_rows = []
+
+    with open_archive(path, "r") as archive:
+        header = json.loads(archive.readline() or "{}")
+        if header.get("format") != ARCHIVE_FORMAT:
+            raise ValueError("Not a message archive")
+
+        if header.get("version") != ARCHIVE_VERSION:
+            raise ValueError(f"Unsupported archive version: {header.get('version')}")
+
+        for line in archive:
+            record = json.loads(line)
+
+            match record["table"]:
+                case "client":
+                    client_rows.append(record["row"])
+                    counts["client"] += 1
+
+                    if len(client_rows) >= chunk_size:
+                        _import_clients(client_rows, client_ids)
+                        client_rows = []
+                case "messages":
+                    # Flush buffered clients before their messages so that they can be resolved
+                    if client_rows:
+                        _import_clients(client_rows, client_ids)
+                        client_rows = []
+
+                    message_rows.append(record["row"])
+                    counts["messages"] += 1
+
+                    if len(message_rows) >= chunk_size:
+                        counts["duplicates"] += _import_messages(message_rows, client_ids)
+                        message_rows = []
+                case table:
+                    raise ValueError(f"Unknown archive table: {table}")
+
+    if client_rows:
+        _import_clients(client_rows, client_ids)
+
+    if message_rows:
+        counts["duplicates"] += _import_messages(message_rows, client_ids)
+
+    return counts
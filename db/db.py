@@ -1,11 +1,46 @@
 # =-- Dependencies --= #
-from sqlalchemy import Column, Integer, String, ForeignKey, create_engine, DateTime
+from sqlalchemy import Column, Integer, String, ForeignKey, create_engine, DateTime, Index, event, func, inspect, select, text, tuple_
 from sqlalchemy.orm import sessionmaker, declarative_base, relationship
 from typing import Literal
+import threading
 import datetime
+import os
 
 Base = declarative_base()
 
+# =-- Message Clock --= #
+def utc_now():
+    """
+    Returns the current UTC time; used as a per-row default rather than a value fixed at import.
+    :return: A timezone-aware datetime.
+    """
+    return datetime.datetime.now(datetime.UTC)
+
+class MessageSequence:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.last = None
+
+    def next(self, context):
+        """
+        Returns the next sequence number, resuming after the highest one stored on first use.
+        Used as the seq column default, so it is also applied to bulk inserts.
+        :param context: The SQLAlchemy execution context of the insert.
+        :return: The sequence number.
+        """
+        with self.lock:
+            if self.last is None:
+                self.last = context.connection.execute(select(func.max(Message.seq))).scalar() or 0
+
+            self.last += 1
+            return self.last
+
+    def reset(self):
+        with self.lock:
+            self.last = None
+
+message_sequence = MessageSequence()
+
 # =-- Message --= #
 class Message(Base):
     __tablename__= "messages"
@@ -15,12 +50,28 @@ class Message(Base):
     sender_id = Column(Integer, ForeignKey('client.id'))
     receiver_id = Column(Integer, ForeignKey('client.id'))
     auth_key = Column(String, nullable=False)
-    iv = Column(String, nullable=False)
-    timestamp = Column(DateTime, default=datetime.datetime.now(datetime.UTC))
+    iv = Column(String, nullable=False, index=True) # Looked up by archive imports to skip duplicates
+    # The server default matches the ORM's microsecond format, so rows inserted without the ORM keep their place in time
+    timestamp = Column(DateTime, default=utc_now, server_default=text("(strftime('%Y-%m-%d %H:%M:%f000', 'now'))"))
+    seq = Column(Integer, default=message_sequence.next, index=True) # Orders messages whose timestamps collide
 
     sender = relationship("Client", foreign_keys=[sender_id]) # [sender_id] due to ambiguity
     receiver = relationship("Client", foreign_keys=[receiver_id]) # [receiver_id] due to ambiguity
 
+    # Serves time-ordered listings, time-range scans and keyset pagination without a sort
+    __table_args__ = (Index("ix_messages_timestamp_seq_id", "timestamp", "seq", "id"),)
+
+# Listing order: by time, with the sequence breaking ties between colliding wall-clock values
+MESSAGE_ORDER = (Message.timestamp, Message.seq, Message.id)
+
+def message_key(message: Message):
+    """
+    Returns a message's position in the listing order, for use as a keyset pagination cursor.
+    :param message: The message object.
+    :return: (timestamp, seq, id)
+    """
+    return message.timestamp, message.seq, message.id
+
 # =-- CRUD Operations --= #
 def create_message(content: str, direction: Literal["sent", "received"], sender_id: int, receiver_id: int, auth_key: str, iv: str) -> Message:
     """
@@ -125,9 +176,35 @@ def list_all_messages():
     List all messages in the messages table.
     :return: A list of message objects.
     """
-    messages = session.query(Message).all()
+    messages = session.query(Message).order_by(*MESSAGE_ORDER).all()
     return messages
 
+def list_messages_page(after: tuple=None, limit: int=100, client=None, start: datetime.datetime=None, end: datetime.datetime=None):
+    """
+    Returns one page of messages in (timestamp, seq, ID) order using keyset pagination.
+    :param after: The message_key of the last message on the previous page, or None for the first page.
+    :param limit: The maximum number of messages to return.
+    :param client: An optional client object; only messages sent by this client are returned.
+    :param start: If given, only messages with a timestamp at or after this time are returned.
+    :param end: If given, only messages with a timestamp before this time are returned.
+    :return: A list of message objects.
+    """
+    query = session.query(Message)
+
+    if after is not None:
+        query = query.filter(tuple_(*MESSAGE_ORDER) > tuple_(*after))
+
+    if client is not None:
+        query = query.filter_by(sender_id=client.id)
+
+    if start is not None:
+        query = query.filter(Message.timestamp >= start)
+
+    if end is not None:
+        query = query.filter(Message.timestamp < end)
+
+    return query.order_by(*MESSAGE_ORDER).limit(limit).all()
+
 # =-- Client --= #
 class Client(Base):
     __tablename__ = 'client'
@@ -139,11 +216,81 @@ class Client(Base):
     received_messages = relationship("Message", foreign_keys='Message.receiver_id', back_populates="receiver")
 
 # =-- DB Init --= #
-engine = create_engine('sqlite:///messaging.db')
-Base.metadata.create_all(engine)
+DEFAULT_DB_URL = 'sqlite:///messaging.db'
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    # Only takes effect on a new database; existing files are converted by db.retention.enable_incremental_vacuum
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    cursor.close()
+
+# SQLite cannot default a column to an expression over the table, so seq is filled in after inserts that bypass
+# the ORM. Tables created by older versions have no timestamp default, so NULL and whole-second timestamps are
+# also brought to the ORM's format so that they compare correctly against the keyset cursor.
+MESSAGE_DEFAULTS_TRIGGER = """
+CREATE TRIGGER IF NOT EXISTS messages_server_defaults AFTER INSERT ON messages
+WHEN NEW.seq IS NULL OR NEW.timestamp IS NULL OR length(NEW.timestamp) = 19
+BEGIN
+    UPDATE messages SET
+        seq = coalesce(NEW.seq, (SELECT coalesce(max(seq), 0) + 1 FROM messages)),
+        timestamp = CASE
+            WHEN NEW.timestamp IS NULL THEN strftime('%Y-%m-%d %H:%M:%f000', 'now')
+            WHEN length(NEW.timestamp) = 19 THEN NEW.timestamp || '.000000'
+            ELSE NEW.timestamp
+        END
+    WHERE id = NEW.id;
+END
+"""
+
+def migrate_messages_table(engine):
+    """
+    Brings a messages table created by an older version up to date: adds and backfills the seq column,
+    creates missing indexes and the server-side defaults trigger.
+    Rows without a sequence number are given their ID.
+    :param engine: The engine of the database to migrate.
+    :return: None
+    """
+    columns = {column["name"] for column in inspect(engine).get_columns(Message.__tablename__)}
+
+    with engine.begin() as connection:
+        if "seq" not in columns:
+            connection.exec_driver_sql("ALTER TABLE messages ADD COLUMN seq INTEGER")
+
+        has_trigger = connection.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'messages_server_defaults'").scalar()
+
+        # Once the trigger exists it keeps these columns filled, so the backfill only runs once
+        if not has_trigger:
+            connection.exec_driver_sql("UPDATE messages SET seq = id WHERE seq IS NULL")
+            connection.exec_driver_sql("UPDATE messages SET timestamp = timestamp || '.000000' WHERE length(timestamp) = 19")
+            connection.exec_driver_sql("DROP INDEX IF EXISTS ix_messages_timestamp") # Superseded by ix_messages_timestamp_seq_id
+            connection.exec_driver_sql(MESSAGE_DEFAULTS_TRIGGER)
+
+        for index in Message.__table__.indexes:
+            index.create(connection, checkfirst=True)
+
+def init_db(url: str=DEFAULT_DB_URL):
+    """
+    Binds the module session to the database at the given URL, creating its tables if needed.
+    :param url: The SQLAlchemy database URL.
+    :return: The new engine.
+    """
+    global engine
+    engine = create_engine(url)
+    event.listen(engine, "connect", set_sqlite_pragmas)
+    Base.metadata.create_all(engine)
+    migrate_messages_table(engine)
+
+    # Rebind the existing session so modules that imported it keep working
+    session.close()
+    session.bind = engine
+    message_sequence.reset()
+
+    return engine
 
-Session = sessionmaker(bind=engine)
+Session = sessionmaker()
 session = Session()
+engine = init_db(os.environ.get("MORSECRYPTION_DB_URL", DEFAULT_DB_URL))
 
 # =-- CRUD Operations --= #
 def create_or_get_client(name, auth_key):
@@ -284,6 +431,44 @@ def list_clients_messages(client: Client):
     :param client: An object of the client to query
     :return: A list of messages.
     """
-    messages = session.query(Message).filter_by(sender_id=client.id).all()
+    messages = session.query(Message).filter_by(sender_id=client.id).order_by(*MESSAGE_ORDER).all()
+
+    return messages
+
+# =-- Streaming --= #
+def iter_messages(client: Client=None, chunk_size: int=500, start: datetime.datetime=None, end: datetime.datetime=None):
+    """
+    Yields messages in (timestamp, seq, ID) order, loading at most chunk_size rows at a time.
+    :param client: An optional client object; only messages sent by this client are yielded.
+    :param chunk_size: The number of rows to fetch per query.
+    :param start: If given, only messages with a timestamp at or after this time are yielded.
+    :param end: If given, only messages with a timestamp before this time are yielded.
+    :return: A generator of message objects.
+    """
+    after = None
+    while True:
+        chunk = list_messages_page(after, chunk_size, client, start, end)
+
+        # Stop once the table is exhausted
+        if not chunk:
+            return
+
+        yield from chunk
+        after = message_key(chunk[-1])
+
+def iter_clients(chunk_size: int=500):
+    """
+    Yields clients in ID order, loading at most chunk_size rows at a time.
+    :param chunk_size: The number of rows to fetch per query.
+    :return: A generator of client objects.
+    """
+    last_id = 0
+    while True:
+        chunk = session.query(Client).filter(Client.id > last_id).order_by(Client.id).limit(chunk_size).all()
+
+        # Stop once the table is exhausted
+        if not chunk:
+            return
 
-    return messages
\ No newline at end of file
+        yield from chunk
+        last_id = chunk[-1].id
\ No newline at end of file
@@ -0,0 +1,217 @@
+# =-- Dependencies --= #
+from db.db import Message, MESSAGE_ORDER, session, iter_clients
+from db.archive import archive_member, detect_compression, write_header, write_clients, write_record, message_row
+from sqlalchemy import tuple_
+from typing import Literal
+import threading
+import datetime
+import time
+import os
+
+# =-- Retention Policy --= #
+class RetentionPolicy:
+    def __init__(self, max_age: datetime.timedelta=None, max_rows_per_client: int=None, max_db_bytes: int=None):
+        """
+        A set of retention rules; rules left as None are not enforced.
+        :param max_age: Messages older than this are deleted.
+        :param max_rows_per_client: Only this many of each client's most recent sent messages are kept.
+        :param max_db_bytes: The oldest messages are deleted until the live pages fit in this many bytes.
+        """
+        self.max_age = max_age
+        self.max_rows_per_client = max_rows_per_client
+        self.max_db_bytes = max_db_bytes
+
+class RetentionReport:
+    def __init__(self):
+        self.deleted = {"max_age": 0, "max_rows_per_client": 0, "max_db_bytes": 0}
+        self.archived = 0
+        self.freed_bytes = 0 # Pages moved to the freelist by the deletes
+        self.reclaimed_bytes = 0 # Bytes returned to the file system by vacuuming
+        self.purge_seconds = 0.0
+        self.vacuum_seconds = 0.0
+        self.vacuum_thread = None
+
+    def wait(self):
+        """
+        Blocks until a background vacuum, if any, has finished.
+        :return: The report.
+        """
+        if self.vacuum_thread is not None:
+            self.vacuum_thread.join()
+
+        return self
+
+    def as_dict(self):
+        return {
+            "deleted": dict(self.deleted),
+            "archived": self.archived,
+            "freed_bytes": self.freed_bytes,
+            "reclaimed_bytes": self.reclaimed_bytes,
+            "purge_seconds": round(self.purge_seconds, 3),
+            "vacuum_seconds": round(self.vacuum_seconds, 3)
+        }
+
+# =-- Database Size --= #
+def _pragma(connection, name):
+    return connection.exec_driver_sql(f"PRAGMA {name}").scalar()
+
+def database_size():
+    """
+    Returns the size of the database file and how much of it is live data.
+    :return: (file bytes, live bytes)
+    """
+    connection = session.connection()
+    page_size = _pragma(connection, "page_size")
+    page_count = _pragma(connection, "page_count")
+    freelist_count = _pragma(connection, "freelist_count")
+
+    return page_count * page_size, (page_count - freelist_count) * page_size
+
+def _autocommit_connection():
+    # VACUUM and incremental_vacuum must run outside of a transaction
+    return session.get_bind().connect().execution_options(isolation_level="AUTOCOMMIT")
+
+def enable_incremental_vacuum():
+    """
+    Converts an existing database to auto_vacuum=INCREMENTAL, which requires one full VACUUM.
+    :return: True if the database was converted, False if it already used incremental vacuum.
+    """
+    session.commit()
+
+    with _autocommit_connection() as connection:
+        if _pragma(connection, "auto_vacuum") == 2:
+            return False
+
+        connection.exec_driver_sql("PRAGMA auto_vacuum=INCREMENTAL")
+        connection.exec_driver_sql("VACUUM")
+
+    return True
+
+def incremental_vacuum(report: RetentionReport, pages_per_step: int=256, pause: float=0.05):
+    """
+    Returns free pages to the file system a few at a time, releasing the write lock between steps.
+    :param report: The report to add reclaimed bytes and time spent to.
+    :param pages_per_step: The number of pages freed per step.
+    :param pause: Seconds to sleep between steps so that writers are not starved.
+    :return: None
+    """
+    start_time = time.perf_counter()
+
+    with _autocommit_connection() as connection:
+        page_size = _pragma(connection, "page_size")
+
+        while _pragma(connection, "freelist_count") > 0:
+            before = _pragma(connection, "page_count")
+
+            # sqlite3's execute() steps the pragma once, freeing a single page; executescript runs it to completion
+            connection.connection.dbapi_connection.executescript(f"PRAGMA incremental_vacuum({pages_per_step});")
+
+            freed = before - _pragma(connection, "page_count")
+            if freed == 0:
+                break
+
+            report.reclaimed_bytes += freed * page_size
+            time.sleep(pause)
+
+    report.vacuum_seconds += time.perf_counter() - start_time
+
+# =-- Purging --= #
+def _purge(rule, next_ids, report, archive, compression):
+    # Delete chunk by chunk, one transaction each, until the rule selects nothing
+    while True:
+        ids = next_ids()
+        if not ids:
+            return
+
+        query = session.query(Message).filter(Message.id.in_(ids))
+
+        # Each chunk is a complete member on disk before its rows are deleted
+        if archive is not None:
+            with archive_member(archive, compression) as member:
+                for message in query.order_by(*MESSAGE_ORDER):
+                    write_record(member, "messages", message_row(message))
+            report.archived += len(ids)
+
+        report.deleted[rule] += query.delete(synchronize_session=False)
+        session.commit()
+
+def _ids(query, chunk_size):
+    # Oldest first
+    return [message_id for message_id, in query.order_by(*MESSAGE_ORDER).limit(chunk_size)]
+
+def apply_retention(policy: RetentionPolicy, archive_path=None, compression=None, chunk_size: int=500,
+                    vacuum: Literal["none", "foreground", "background"]="background") -> RetentionReport:
+    """
+    Deletes messages that fall outside the retention policy in chunked transactions.
+    Vacuuming only shrinks the file once the database uses incremental auto_vacuum (see enable_incremental_vacuum).
+    :param policy: The retention policy to enforce.
+    :param archive_path: If given, deleted messages are first written to this archive, appending if it exists.
+    :param compression: One of None, "gzip", "bz2" or "xz" for the archive.
+    :param chunk_size: The number of messages deleted per transaction.
+    :param vacuum: Whether to return freed pages to the file system, and on which thread.
+    :return: A report of rows deleted, space freed and time spent.
+    """
+    report = RetentionReport()
+    start_time = time.perf_counter()
+
+    archive = None
+    if archive_path is not None:
+        # Append so that a reused path (e.g. a nightly prune) never destroys earlier archived rows
+        is_new = not os.path.exists(archive_path) or os.path.getsize(archive_path) == 0
+        if not is_new and detect_compression(archive_path) != compression:
+            raise ValueError(f"Archive {archive_path} exists with a different compression")
+
+        archive = open(archive_path, "ab")
+        with archive_member(archive, compression) as member:
+            # Clients are repeated on append so that the new messages can be resolved on import
+            if is_new:
+                write_header(member, chunk_size)
+            else:
+                write_clients(member, chunk_size)
+
+    _, live_bytes_before = database_size()
+
+    try:
+        if policy.max_age is not None:
+            cutoff = datetime.datetime.now(datetime.UTC) - policy.max_age
+            expired = session.query(Message.id).filter(Message.timestamp < cutoff)
+            _purge("max_age", lambda: _ids(expired, chunk_size), report, archive, compression)
+
+        if policy.max_rows_per_client is not None:
+            for client in iter_clients(chunk_size):
+                excess = session.query(Message.id).filter_by(sender_id=client.id)
+
+                if policy.max_rows_per_client > 0:
+                    # The oldest message the client is allowed to keep, ranked by age rather than ID
+                    oldest_kept = (excess.with_entities(*MESSAGE_ORDER)
+                                   .order_by(*[column.desc() for column in MESSAGE_ORDER])
+                                   .offset(policy.max_rows_per_client - 1).first())
+
+                    if oldest_kept is None:
+                        continue
+
+                    excess = excess.filter(tuple_(*MESSAGE_ORDER) < tuple_(*oldest_kept))
+
+                _purge("max_rows_per_client", lambda: _ids(excess, chunk_size), report, archive, compression)
+
+        if policy.max_db_bytes is not None:
+            oldest = session.query(Message.id)
+            _purge("max_db_bytes", lambda: _ids(oldest, chunk_size) if database_size()[1] > policy.max_db_bytes else [],
+                   report, archive, compression)
+    finally:
+        if archive is not None:
+            archive.close()
+
+    _, live_bytes_after = database_size()
+    report.freed_bytes = live_bytes_before - live_bytes_after
+    report.purge_seconds = time.perf_counter() - start_time
+    session.commit()
+
+    match vacuum:
+        case "foreground":
+            incremental_vacuum(report)
+        case "background":
+            report.vacuum_thread = threading.Thread(target=incremental_vacuum, args=(report,), daemon=True)
+            report.vacuum_thread.start()
+
+    return report
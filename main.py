@@ -3,13 +3,19 @@ from db.db import (list_all_messages, verify_client_by_id, verify_client_by_name
     get_client_by_name, get_client_by_id, get_message_by_id)
 from util.crypto_utils import hash_sha512, decrypt
 from util.morse_utils import MorseCodeTree
+from util import metrics
 from time import time, sleep
 from client import Client
 import gpiozero
+import logging
+import os
 
 # =-- Constant Settings --= #
 active = True
 
+# =-- Logging --= #
+connection_logger = logging.getLogger("handler.connection")
+
 # =-- Hardware --= #
 yellow_led = gpiozero.LED(14)
 green_led = gpiozero.LED(15)
@@ -132,7 +138,7 @@ def database_flow():
                     f"ID: {message.id} | Direction: {message.direction} | "
                     f"Sender ID: {message.sender_id} | Receiver ID: {message.receiver_id} |"
                     f" Timestamp: {message.timestamp}")
-                sleep(3)
+            sleep(3)
 
         elif choice == '4': # Search client by name or id
             name_or_id = input("Would you like to search client by name (1) or ID (2)? ")
@@ -196,18 +202,18 @@ def database_flow():
 
 def connection_flow(sending_client, receiving_client):
     global active
-    print(f"[CONNECTION HANDLER] {sending_client.name} and {receiving_client.name} are connected.")
+    connection_logger.info("%s and %s are connected.", sending_client.name, receiving_client.name)
 
     morse_tree = MorseCodeTree()
     morse_tree.populate_tree()
 
     while active:
         # Input morse code
-        print("[CONNECTION HANDLER] You are currently: ", sending_client.name)
+        connection_logger.info("You are currently: %s", sending_client.name)
         morse_code = input_morse_code()
 
         # Process input
-        print("[CONNECTION HANDLER] Reminder - you are currently: ", sending_client.name)
+        connection_logger.info("Reminder - you are currently: %s", sending_client.name)
         print("Final morse code: ", morse_code)
         print("This message decodes in English to: ", morse_tree.decode(morse_code))
 
@@ -217,12 +223,28 @@ def connection_flow(sending_client, receiving_client):
         # Flip clients
         sending_client, receiving_client = receiving_client, sending_client
 
-        print("[CONNECTION HANDLER] Message fully processed.")
+        connection_logger.info("Message fully processed.")
         yellow_led.on()
         sleep(1)
         yellow_led.off()
 
 def main():
+    # Handler output is routed through logging so that it can be silenced in production
+    log_level = os.environ.get("MORSECRYPTION_LOG_LEVEL", "INFO").upper()
+    known_level = isinstance(logging.getLevelName(log_level), int)
+    logging.basicConfig(level=log_level if known_level else logging.INFO,
+                        format="[%(levelname)s] [%(name)s] %(message)s")
+    if not known_level:
+        logging.warning("Unknown MORSECRYPTION_LOG_LEVEL %r, using INFO.", log_level)
+
+    # Metrics stay disabled (and near free) unless an exporter is configured
+    if os.environ.get("MORSECRYPTION_METRICS_PORT"):
+        metrics.start_http_server(int(os.environ["MORSECRYPTION_METRICS_PORT"]),
+                                  os.environ.get("MORSECRYPTION_METRICS_HOST", "127.0.0.1"))
+    if os.environ.get("MORSECRYPTION_METRICS_JSON"):
+        metrics.start_json_dump(os.environ["MORSECRYPTION_METRICS_JSON"],
+                                float(os.environ.get("MORSECRYPTION_METRICS_INTERVAL", "60")))
+
     while True:
         mode_selection = input("Would you like to view stored messages (enter 1) or establish a connection (enter 2)?")
         if mode_selection == '1':
@@ -2,6 +2,7 @@
 from Crypto.Random import get_random_bytes
 from Crypto.Util import Padding
 from Crypto.Cipher import AES
+from util import metrics
 import hashlib
 import base64
 
@@ -68,7 +69,8 @@ def hash_sha512(text: str):
     :param text: The unhashed text
     :return: (16 byte encryption key, 32 byte authentication key)
     """
-    full_hash = hashlib.sha512(text.encode()).digest()
+    with metrics.timer("key_derivation"):
+        full_hash = hashlib.sha512(text.encode()).digest()
 
     k_auth = base64.b64encode(full_hash[:32]).decode()
     k_enc = base64.b64encode(full_hash[32:48]).decode() # Only 16 bytes for AES 128 support
@@ -0,0 +1,218 @@
+# =-- Dependencies --= #
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import contextlib
+import threading
+import bisect
+import json
+import time
+import os
+
+# =-- Constant Settings --= #
+PREFIX = "morsecryption"
+DEFAULT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0)
+NULL_TIMER = contextlib.nullcontext() # Shared no-op returned while metrics are disabled
+
+enabled = os.environ.get("MORSECRYPTION_METRICS") == "1"
+
+# =-- Metric Types --= #
+class Counter:
+    def __init__(self, name, description):
+        self.name = name
+        self.description = description
+        self.value = 0
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self.lock:
+            self.value += amount
+
+    def render(self):
+        return [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} counter", f"{self.name} {self.value}"]
+
+    def as_dict(self):
+        return {"type": "counter", "value": self.value}
+
+class Histogram:
+    def __init__(self, name, description, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1) # Last slot is the +Inf bucket
+        self.sum = 0.0
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+
+        # Prometheus buckets are cumulative
+        cumulative = 0
+        for bound, count in zip(list(self.buckets) + ["+Inf"], self.counts):
+            cumulative += count
+            lines.append(f'{self.name}_bucket{{le="{bound}"}} {cumulative}')
+
+        lines.append(f"{self.name}_sum {self.sum}")
+        lines.append(f"{self.name}_count {self.count}")
+        return lines
+
+    def as_dict(self):
+        return {
+            "type": "histogram",
+            "buckets": dict(zip([str(bound) for bound in self.buckets] + ["+Inf"], self.counts)),
+            "sum": self.sum,
+            "count": self.count
+        }
+
+class Timer:
+    def __init__(self, histogram: Histogram):
+        self.histogram = histogram
+        self.start_time = None
+
+    def __enter__(self):
+        self.start_time = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.histogram.observe(time.perf_counter() - self.start_time)
+        return False
+
+# =-- Registry --= #
+metrics = {}
+registry_lock = threading.Lock()
+
+def get_counter(name, description=""):
+    """
+    Returns the counter registered under name, creating it on first use.
+    :param name: The metric name, without the project prefix or _total suffix.
+    :param description: The help text shown in the Prometheus export.
+    :return: The counter.
+    """
+    full_name = f"{PREFIX}_{name}_total"
+    with registry_lock:
+        if full_name not in metrics:
+            metrics[full_name] = Counter(full_name, description or name)
+        return metrics[full_name]
+
+def get_histogram(name, description=""):
+    """
+    Returns the latency histogram registered under name, creating it on first use.
+    :param name: The stage name, without the project prefix or _seconds suffix.
+    :param description: The help text shown in the Prometheus export.
+    :return: The histogram.
+    """
+    full_name = f"{PREFIX}_{name}_seconds"
+    with registry_lock:
+        if full_name not in metrics:
+            metrics[full_name] = Histogram(full_name, description or f"Latency of the {name} stage")
+        return metrics[full_name]
+
+def timer(stage):
+    """
+    Times a block into the stage's latency histogram; a shared no-op while metrics are disabled.
+    :param stage: The stage name (e.g. "encrypt").
+    :return: A context manager.
+    """
+    if not enabled:
+        return NULL_TIMER
+
+    return Timer(get_histogram(stage))
+
+def count(name, amount=1):
+    """
+    Increments a counter; does nothing while metrics are disabled.
+    :param name: The counter name (e.g. "messages_sent").
+    :param amount: The amount to add.
+    :return: None
+    """
+    if enabled:
+        get_counter(name).inc(amount)
+
+def enable():
+    global enabled
+    enabled = True
+
+def disable():
+    global enabled
+    enabled = False
+
+# =-- Export --= #
+def render_prometheus():
+    """
+    Renders every metric in the Prometheus text exposition format.
+    :return: The exposition text.
+    """
+    with registry_lock:
+        registered = sorted(metrics.items())
+
+    lines = []
+    for _, metric in registered:
+        lines.extend(metric.render())
+
+    return "\n".join(lines) + "\n"
+
+def snapshot():
+    """
+    Returns every metric as a JSON-serializable dict.
+    :return: A dict keyed by metric name.
+    """
+    with registry_lock:
+        registered = sorted(metrics.items())
+
+    return {"timestamp": time.time(), "metrics": {name: metric.as_dict() for name, metric in registered}}
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+
+        body = render_prometheus().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass # Scrapes should not flood the console
+
+def start_http_server(port, host="127.0.0.1"):
+    """
+    Enables metrics and serves them at /metrics on a daemon thread.
+    The endpoint is unauthenticated, so it only listens locally unless another address is given.
+    :param port: The port to listen on.
+    :param host: The address to bind.
+    :return: The HTTP server.
+    """
+    enable()
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def start_json_dump(path, interval: float=60.0):
+    """
+    Enables metrics and periodically writes a JSON snapshot to path on a daemon thread.
+    :param path: The file to (atomically) overwrite.
+    :param interval: Seconds between dumps.
+    :return: The dump thread.
+    """
+    enable()
+
+    def dump_loop():
+        while True:
+            time.sleep(interval)
+            temporary_path = f"{path}.tmp"
+            with open(temporary_path, "w") as dump:
+                json.dump(snapshot(), dump)
+            os.replace(temporary_path, path)
+
+    thread = threading.Thread(target=dump_loop, daemon=True)
+    thread.start()
+    return thread